@@ -48,6 +48,20 @@ def __abs_id__(obj_id: str) -> str:
     return str(__cwd__.joinpath(obj_id).relative_to(__root__)).replace('/', '.').replace('\\', '.')
 
 
+def __type_hook__(d: dict) -> object:
+    return RepoCached.__types__[d['type']].__object_hook__(d)
+
+
+def __default_hook__(obj: object) -> dict:
+    if isinstance(obj, RepoCachedAttrs):
+        return attr.asdict(obj, recurse=False, filter=lambda a, v: a.repr)
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+
+__json_decoder__ = json.JSONDecoder(object_hook=__type_hook__)
+__json_encoder__ = json.JSONEncoder(indent=4, default=__default_hook__)
+
+
 class RepoCached(abc.ABCMeta):
     __types__: typing.Dict[str, RepoCached] = {}
     __instances__: typing.Dict[str, object] = {}
@@ -68,7 +82,7 @@ class RepoCached(abc.ABCMeta):
         obj_id = __abs_id__(obj_id)
         if obj_id not in RepoCached.__instances__:
             with open(__get_path__(obj_id)) as in_file:
-                return json.load(fp=in_file, object_hook=lambda d: RepoCached.__types__[d['type']].__object_hook__(d))
+                return __json_decoder__.decode(in_file.read())
         return RepoCached.__instances__[obj_id]
 
     def cast(cls: typing.Type[T], d: tuple[typing.Union[T, str, dict, list, tuple], ...]) -> tuple[T, ...]:
@@ -89,7 +103,7 @@ class RepoCached(abc.ABCMeta):
         return tuple(v for obj in (d if isinstance(d, (list, tuple)) else (d,)) if isinstance(v := c(obj), cls))
 
 
-@attr.s(frozen=True, kw_only=True)
+@attr.s(frozen=True, slots=True, kw_only=True)
 class RepoCachedAttrs(metaclass=RepoCached):
     id = attr.ib(type=typing.Optional[str], cmp=False, default=None, validator=is_optional_str)
     type = attr.ib(type=str, init=False)
@@ -101,12 +115,12 @@ class RepoCachedAttrs(metaclass=RepoCached):
 
     def write(self):
         with open(__get_path__(self.id), 'w') as out_file:
-            json.dump(obj=attr.asdict(self, filter=lambda a, v: a.repr), fp=out_file, indent=4)
+            out_file.write(__json_encoder__.encode(self))
 
     def __attrs_post_init__(self):
         if self.id is None or '~' not in self.id:
             id_name = self.__class__.__name__.lower()
-            id_content = self.__dict__.get(id_name)
+            id_content = getattr(self, id_name, None)
             if id_content is None:
                 id_content = str(uuid.uuid5(uuid.NAMESPACE_DNS,
                                             str(sorted(str(attr.asdict(self, filter=lambda a, v: a.eq and a.init))))))
@@ -116,7 +130,7 @@ class RepoCachedAttrs(metaclass=RepoCached):
         RepoCached.__instances__[self.id] = self
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Value(RepoCachedAttrs):
     value = attr.ib(type=typing.Optional[typing.Union[bool, int, str]],
                     validator=attr.validators.optional(attr.validators.instance_of((bool, int, str))))
@@ -126,24 +140,29 @@ class Value(RepoCachedAttrs):
         return self.value in policy.allowed and self.value not in policy.denied
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Values(RepoCachedAttrs):
     values = attr.ib(type=typing.Tuple[Value, ...], converter=Value.cast, default=(), validator=is_tuple_of(Value))
+    value_set = attr.ib(type=typing.FrozenSet[typing.Union[bool, int, str]], init=False, eq=False, repr=False)
 
     def __iter__(self):
         yield from self.values
 
-    def __contains__(self, item: Value) -> bool:
+    def __contains__(self, item: typing.Union[Value, bool, int, str]) -> bool:
         if self is all_values:
             return True
-        return item.value in self.values
+        return (item.value if isinstance(item, Value) else item) in self.value_set
+
+    @value_set.default
+    def __value_set_default__(self) -> typing.FrozenSet[typing.Union[bool, int, str]]:
+        return frozenset(v.value for v in self.values)
 
 
 all_values = Values(id='values~all', doc='special values that contains all values')
 no_values = Values(id='values~none', doc='empty list of values')
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Policy(RepoCachedAttrs):
     policy = attr.ib(type=str, default='deny-all', validator=is_instance_of(str))
     allowed = attr.ib(type=Values, default=no_values, converter=Value.cast, validator=is_instance_of(Values))
@@ -185,26 +204,26 @@ class Policy(RepoCachedAttrs):
         return cls()
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Param(RepoCachedAttrs):
     param = attr.ib(type=str, validator=is_instance_of(str))
     policy = attr.ib(type=Policy, factory=Policy, converter=Policy.cast, validator=is_instance_of(Policy))
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Assigned(RepoCachedAttrs):
     param = attr.ib(type=Param, converter=Param.cast, validator=is_instance_of(Param))
     assigned = attr.ib(type=Value, converter=Value.cast, validator=is_instance_of(Value))
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Target(RepoCachedAttrs):
     target = attr.ib(type=str, validator=is_instance_of(str))
     uri = attr.ib(type=str, cmp=False, default='', validator=is_instance_of(str))
     params = attr.ib(type=tuple[Param, ...], default=(), converter=Param.cast, validator=is_instance_of(Param))
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Config(RepoCachedAttrs):
     config = attr.ib(type=str, validator=is_instance_of(str))
     targets = attr.ib(type=tuple[Target, ...], default=(), converter=Target.cast, validator=is_instance_of(Target))
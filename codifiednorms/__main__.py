@@ -3,6 +3,8 @@
 """
 Cmdline interface
 """
+import itertools
+
 from .policy import *
 
 
@@ -95,6 +97,10 @@ def fix_repo() -> None:
 def create_new(policy_class: BasePolicy) -> None:
     ts = str(int(time.time()))
     path = pathlib.Path(os.getcwd()).joinpath(f'{policy_class.__name__}_{ts}.json')
+    for n in itertools.count(1):
+        if not path.exists():
+            break
+        path = path.with_name(f'{policy_class.__name__}_{ts}_{n}.json')  # created within the same second
     if repo_root in path.parents:
         policy = policy_class.from_dict(dict(location=location(path), type=policy_class.__name__))
         policy.dump(path)
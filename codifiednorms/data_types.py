@@ -6,11 +6,17 @@ Class Serializable, Param, Value, Values, ParamPolicy
 """
 from __future__ import annotations
 
+import collections
+import concurrent.futures
+import contextvars
 import functools
+import itertools
 import json
 import os
 import pathlib
 import re
+import sys
+import types
 import typing
 import uuid
 
@@ -25,10 +31,17 @@ T = typing.TypeVar('T', bound='Serializable')
 is_instance_of = attr.validators.instance_of
 
 
-@attr.s(frozen=True, kw_only=True)
+@attr.s(frozen=True, slots=True, kw_only=True)
 class Repo:
     root = attr.ib(type=pathlib.Path, validator=is_instance_of(pathlib.Path))
-    repo_cache = attr.ib(type=dict, factory=dict, init=False)
+    cache_size = attr.ib(type=typing.Optional[int], default=None,
+                         validator=attr.validators.optional(is_instance_of(int)))
+    repo_cache = attr.ib(type=collections.OrderedDict, factory=collections.OrderedDict, init=False)
+    dir_cache = attr.ib(type=set, factory=set, init=False)
+    pinned = attr.ib(type=dict, factory=dict, init=False)
+    root_str = attr.ib(type=str, init=False)
+    file_name_cache = attr.ib(type=dict, factory=dict, init=False)
+    path_cache = attr.ib(type=dict, factory=dict, init=False)
 
     @root.default
     def root_default(self):
@@ -41,39 +54,74 @@ class Repo:
         if not value.is_dir():
             raise ValueError(f'repository {attribute.name} {value} is not a directory')
 
+    @root_str.default
+    def root_str_default(self):
+        return str(self.root)
+
+    def file_name(self, identifier: str) -> str:
+        if (file_name := self.file_name_cache.get(identifier)) is None:
+            file_name = self.root_str + os.sep + identifier.split(':', 1)[1].replace('.', os.sep) + '.json'
+            self.file_name_cache[identifier] = file_name
+        return file_name
+
     def path(self, identifier: str) -> pathlib.Path:
-        identifier = identifier.split(':', 1)[1]
-        return self.root.joinpath(identifier.replace('.', '/')).with_suffix('.json')
+        if (path := self.path_cache.get(identifier)) is None:
+            path = self.path_cache[identifier] = pathlib.Path(self.file_name(identifier))
+        return path
 
-    def identifier(self, path: pathlib.Path) -> str:
-        return 'id:' + str(path.relative_to(self.root)).replace('/', '.').replace('\\', '.')
+    def identifier(self, path: typing.Union[str, pathlib.Path]) -> str:
+        path = os.fspath(path)
+        if not path.startswith(self.root_str + os.sep):
+            raise ValueError(f'{path} is not in repository {self.root_str}')
+        return 'id:' + path[len(self.root_str) + 1:].replace('/', '.').replace('\\', '.')
 
     def is_valid_id(self, identifier: str) -> bool:
         if not identifier.startswith('id:'):
             return False
-        if self.root not in self.path(identifier).parents:
+        name = identifier.split(':', 1)[1]
+        if not all(name.split('.')) or os.path.isabs(name):  # empty segments come from '..' or a leading dot
+            return False
+        if not os.path.normpath(self.file_name(identifier)).startswith(self.root_str + os.sep):
             return False
         return True
 
     def new(self, name: str) -> str:
-        path = pathlib.Path(os.getcwd()).relative_to(self.root).joinpath(f'{name}')
-        path = str(path).replace('/', '.').replace('\\', '.')
-        return f'id:{path}'
+        cwd = os.getcwd()
+        base = cwd if cwd.startswith(self.root_str + os.sep) else self.root_str  # root when outside the repository
+        return self.identifier(base + os.sep + name)
 
     def read(self, identifier: str) -> str:
-        with open(self.path(identifier), 'r') as in_file:
-            return in_file.read()
+        with open(self.file_name(identifier), 'rb') as in_file:
+            return in_file.read().decode()
 
     def write(self, identifier: str, s: str):
-        with open(self.path(identifier), 'w') as out_file:
+        with open(self.file_name(identifier), 'w') as out_file:
             out_file.write(s)
 
+    def makedirs(self, path: str):
+        if path not in self.dir_cache:
+            os.makedirs(path, exist_ok=True)
+            self.dir_cache.add(path)
+
     def put(self, obj: Serializable):
-        if obj.id not in self.repo_cache:
-            self.repo_cache[obj.id] = obj
+        self.repo_cache.setdefault(obj.id, obj)
+        if self.cache_size is not None:
+            self.repo_cache.move_to_end(obj.id)
+            while len(self.repo_cache) > self.cache_size:
+                self.repo_cache.popitem(last=False)
+
+    def pin(self, obj: Serializable):
+        """ put obj and keep serving it from get after the cache_size limit evicts it"""
+        self.pinned[obj.id] = obj
+        self.put(obj)
 
     def get(self, identifier: str) -> Serializable:
-        return self.repo_cache.get(identifier, None)
+        obj = self.repo_cache.get(identifier, None)
+        if obj is None:
+            return self.pinned.get(identifier, None)
+        if self.cache_size is not None:
+            self.repo_cache.move_to_end(identifier)
+        return obj
 
     @property
     def list(self) -> list[str, ...]:
@@ -85,39 +133,133 @@ repo = Repo()
 
 class Specials(str):
     def __eq__(self, other: typing.Union[Specials, str]) -> bool:
-        r = ((False, False, False),
-             (False, None, True),
-             (False, True, True))[
-            0 if int(self is NoValue) else 2 if int(self is AnyValue or self is AllValues) else 1][
-            0 if int(other is NoValue) else 2 if int(other is AnyValue or other is AllValues) else 1]
-        if r is not None:
-            return r
-        return super(Specials, self).__eq__(other)
+        if self is NoValue or other is NoValue:
+            return False
+        if self is AnyValue or self is AllValues or other is AnyValue or other is AllValues:
+            return True
+        return str.__eq__(self, other)
 
 
 AnyValue = Specials('value:AnyValue')
 NoValue = Specials('value:NoValue')
 AllValues = Specials('value:AllValues')
-id_re = re.compile(r'id:[^\s)(=/*-+]*')
-value_re = re.compile(r'value:[^\s)(=/*-+]*')
+reference_re = re.compile(r'(?:id|value):[^\s)(=/*-+]*')
 escape_colon_dot: typing.Callable[[str], str] = lambda key: key.replace(':', '_').replace('.', '_')
 
 
-@attr.s(frozen=True, kw_only=True)
+module_globals: typing.Dict[str, typing.Any] = globals()  # value: references and eval resolve names here
+type_dispatch: typing.Dict[str, typing.Type[Serializable]] = {}  # populated once all Serializable classes exist
+
+
+def object_hook(d: dict) -> typing.Union[Serializable, dict]:
+    cls = type_dispatch.get(d.pop('type', None))
+    return cls(**d) if cls is not None else d
+
+
+json_decoder = json.JSONDecoder(object_hook=object_hook)
+json_encoder = json.JSONEncoder(indent=4, check_circular=False)  # as_dict output is a tree, nothing to check
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_expression(exp_str: str) \
+        -> typing.Tuple[types.CodeType, typing.Tuple[typing.Tuple[str, str], ...], typing.Dict[str, Specials]]:
+    """ compiled code, (escaped name, id) references and resolved value references, computed once per expression"""
+    references = set(reference_re.findall(exp_str))
+    return (compile(escape_colon_dot(exp_str).strip(), '<expression>', 'eval'),
+            tuple((escape_colon_dot(k), k) for k in references if k.startswith('id:')),
+            {escape_colon_dot(k): module_globals[k.split(':', 1)[1]] for k in references if k.startswith('value:')})
+
+
+def eq_repr(value: typing.Any) -> str:
+    """ str(attr.asdict(value, filter=lambda a, v: a.eq)) built directly, without the intermediate dicts"""
+    if isinstance(value, Serializable):
+        return '{' + ', '.join(f'{a.name!r}: {eq_repr(getattr(value, a.name))}'
+                               for a in attr.fields(value.__class__) if a.eq) + '}'
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return '[' + ', '.join(eq_repr(v) for v in value) + ']'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f'{eq_repr(k)}: {eq_repr(v)}' for k, v in value.items()) + '}'
+    return repr(value)
+
+
+def as_plain(value: typing.Any) -> typing.Any:
+    """ attr.asdict equivalent for a single field value"""
+    if isinstance(value, Serializable):
+        return value.as_dict()
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return [as_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {as_plain(k): as_plain(v) for k, v in value.items()}
+    return value
+
+
+NotCached = object()
+
+
+def cache_field() -> typing.Any:
+    """ slot backing a cached_slot: not an __init__ argument, not compared or serialized, reset by evolve"""
+    return attr.ib(default=NotCached, init=False, eq=False, repr=False, metadata={'cache': True})
+
+
+class cached_slot:
+    """ functools.cached_property for slotted attrs classes, stores the value in the _<name> cache_field"""
+
+    def __init__(self, func: typing.Callable[[typing.Any], typing.Any]):
+        functools.update_wrapper(self, func)
+        self.func, self.slot = func, f'_{func.__name__}'
+
+    def __get__(self, obj: typing.Any, cls: typing.Optional[type] = None) -> typing.Any:
+        if obj is None:
+            return self
+        if (value := getattr(obj, self.slot)) is NotCached:
+            value = self.func(obj)
+            object.__setattr__(obj, self.slot, value)
+        return value
+
+
+caching = contextvars.ContextVar('caching', default=True)  # False while building intermediate results
+
+
+def intermediate_evolve(obj: T, **changes) -> T:
+    """ unchecked_evolve for intermediate results of set operations, which are not put in the repo cache"""
+    token = caching.set(False)
+    try:
+        return unchecked_evolve(obj, **changes)
+    finally:
+        caching.reset(token)
+
+
+def unchecked_evolve(obj: T, **changes) -> T:
+    """ attr.evolve for trusted internal rebuilds, copies the fields without running converters or validators"""
+    new = object.__new__(obj.__class__)
+    for a in attr.fields(obj.__class__):
+        if a.name in changes:
+            object.__setattr__(new, a.name, changes[a.name])
+        else:
+            object.__setattr__(new, a.name, NotCached if a.metadata.get('cache') else getattr(obj, a.name))
+    new.__attrs_post_init__()
+    return new
+
+
+@attr.s(frozen=True, slots=True, kw_only=True)
 class Serializable:
     id = attr.ib(type=str, eq=False, default='', validator=is_instance_of(str))
     type = attr.ib(type=str, eq=False, init=False)
     doc = attr.ib(type=str, eq=False, default='', validator=is_instance_of(str))
+    _as_dict = cache_field()
+    _dumps = cache_field()
 
     def __attrs_post_init__(self):
-        obj_name = ''.join(self.name.split()) if hasattr(self, 'name') \
-            else ''.join(self.value.split()) if hasattr(self, 'value') \
-            else uuid.uuid5(uuid.NAMESPACE_URL, str(attr.asdict(self, filter=lambda a, v: a.eq))).hex
-        if self.id == '':
-            object.__setattr__(self, 'id', repo.new(f'{self.__class__.__name__.lower()}_{obj_name}'))
-        if self.doc == '':
-            object.__setattr__(self, 'doc', f'doc for {obj_name}')
-        repo.put(obj=self)
+        if self.id == '' or self.doc == '':
+            obj_name = ''.join(self.name.split()) if hasattr(self, 'name') \
+                else ''.join(self.value.split()) if hasattr(self, 'value') \
+                else uuid.uuid5(uuid.NAMESPACE_URL, eq_repr(self)).hex
+            if self.id == '':
+                object.__setattr__(self, 'id', repo.new(f'{self.__class__.__name__.lower()}_{obj_name}'))
+            if self.doc == '':
+                object.__setattr__(self, 'doc', f'doc for {obj_name}')
+        if caching.get():
+            repo.put(obj=self)
 
     @type.default
     def type_default(self) -> str:
@@ -126,16 +268,60 @@ class Serializable:
     def dump(self):
         repo.write(self.id, self.dumps())
 
+    @staticmethod
+    def dump_many(objs: typing.Iterable[Serializable]):
+        """ dump several objects, creating each folder once and overlapping the file writes in threads"""
+        objs = tuple(objs)
+        for folder in {os.path.dirname(repo.file_name(obj.id)) for obj in objs}:
+            repo.makedirs(folder)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            list(executor.map(Serializable.dump, objs))
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def serializer(cls) -> typing.Callable[[Serializable], dict]:
+        """ generate, once per class, a function building the attr.asdict of an instance field by field"""
+        items = []
+        for a in attr.fields(cls):
+            if a.metadata.get('cache'):
+                continue
+            if a.type is str:
+                items.append(f'{a.name!r}: self.{a.name}')
+            elif isinstance(a.type, type) and issubclass(a.type, Serializable):
+                items.append(f'{a.name!r}: self.{a.name}.as_dict()')
+            elif typing.get_origin(a.type) is tuple and len(args := typing.get_args(a.type)) == 2 \
+                    and args[1] is Ellipsis and isinstance(args[0], type) and issubclass(args[0], Serializable):
+                items.append(f'{a.name!r}: [v.as_dict() for v in self.{a.name}]')
+            else:
+                items.append(f'{a.name!r}: as_plain(self.{a.name})')
+        namespace = {'as_plain': as_plain}
+        exec(f'def as_dict(self):\n    return {{{", ".join(items)}}}\n', namespace)
+        return namespace['as_dict']
+
+    def as_dict(self) -> dict:
+        """ field dict of the (frozen) instance, built once and shared, callers must not modify it"""
+        if (d := self._as_dict) is NotCached:
+            d = self.serializer()(self)
+            object.__setattr__(self, '_as_dict', d)
+        return d
+
     def dumps(self) -> str:
-        return json.dumps(obj=attr.asdict(self), indent=4)
+        """ json text of the (frozen) instance, encoded once"""
+        if (s := self._dumps) is NotCached:
+            s = json_encoder.encode(self.as_dict())
+            object.__setattr__(self, '_dumps', s)
+        return s
 
     @classmethod
     def load(cls: typing.Type[T], identifier: str) -> T:
-        return cls.loads(repo.read(identifier))
+        """ object with identifier from repo_cache, parsed from the repository file only on a miss"""
+        if (obj := repo.get(identifier)) is None:
+            obj = cls.loads(repo.read(identifier))
+        return obj
 
     @classmethod
     def loads(cls: typing.Type[T], data: str) -> T:
-        return json.loads(s=data, object_hook=lambda d: globals().get(d.pop('type'), lambda **kw: kw)(**d))
+        return json_decoder.decode(data)
 
     @classmethod
     def cast(cls: typing.Type[T], data: typing.Union[T, typing.Iterable, bool, int, str]) \
@@ -143,15 +329,17 @@ class Serializable:
         if isinstance(data, cls):
             return data
         if isinstance(data, str):
-            if data.startswith('id:'):
-                return repo.get(data) or cls.load(data)
-            if data.startswith('value:'):
-                return globals()[data.split(":", 1)[1]]
-            if data.startswith('expression:'):
-                exp_str = data.split(':', 1)[1]
-                value_s = {escape_colon_dot(k): globals()[k.split(':', 1)[1]] for k in set(value_re.findall(exp_str))}
-                id_s = {escape_colon_dot(k): (repo.get(k) or cls.load(k)) for k in set(id_re.findall(exp_str))}
-                return eval(escape_colon_dot(exp_str), globals(), dict(id_s, **value_s))
+            prefix, sep, rest = data.partition(':')
+            if sep:
+                if prefix == 'id':
+                    return cls.load(data)
+                if prefix == 'value':
+                    return module_globals[rest]
+                if prefix == 'expression':
+                    code, id_refs, value_names = parse_expression(rest)
+                    names = dict(value_names)
+                    names.update((name, cls.load(k)) for name, k in id_refs)
+                    return eval(code, module_globals, names)
             # noinspection PyArgumentList
             return cls(data)
         if isinstance(data, (int, bool)):
@@ -165,54 +353,131 @@ class Serializable:
         if isinstance(data, dict):
             return cls(**data)
 
+    @property
+    def compiled_id(self) -> str:
+        return 'id:compiled.' + self.id.split(':', 1)[1]
+
     def compile(self: T) -> T:
-        out_folder = repo.root.joinpath('compiled')
-        file_path = out_folder.joinpath((fp := repo.path(self.id)).parent.relative_to(repo.root), fp.stem)
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        obj = attr.evolve(self, id=repo.identifier(file_path))
+        compiled_id = self.compiled_id
+        repo.makedirs(os.path.dirname(repo.file_name(compiled_id)))
+        obj = unchecked_evolve(self, id=compiled_id)
         obj.dump()
         return obj
 
 
-@attr.s(frozen=True)
+@functools.lru_cache(maxsize=4096)
+def shared_value(data: str, cwd: str) -> Value:
+    """ one Value per plain str, keyed on cwd too as the id given by repo.new depends on the working directory"""
+    return super(Value, Value).cast(data)
+
+
+def intern_value(value: typing.Any) -> typing.Any:
+    """ plain str values are interned so equal values loaded from many files share one object"""
+    return sys.intern(value) if type(value) is str else value
+
+
+@attr.s(frozen=True, slots=True, hash=False)
 class Value(Serializable):
-    value = attr.ib(type=typing.Union[bool, int, str, Specials], validator=is_instance_of((bool, int, str, Specials)))
+    value = attr.ib(type=typing.Union[bool, int, str, Specials], converter=intern_value,
+                    validator=is_instance_of((bool, int, str, Specials)))
+    _value_hash = cache_field()
 
     def __bool__(self) -> bool:
         return bool(self.value)
 
+    def __hash__(self) -> int:
+        return self.value_hash
+
+    @classmethod
+    def cast(cls, data: typing.Union[Value, typing.Iterable, bool, int, str]) \
+            -> typing.Optional[typing.Union[Value, typing.Tuple[Value, ...]]]:
+        """ Serializable.cast, sharing one instance per plain str instead of building a new Value each time"""
+        if type(data) is str and ':' not in data:
+            return shared_value(data, os.getcwd())
+        return super().cast(data)
+
+    @cached_slot
+    def value_hash(self) -> int:
+        """ hash of the only eq field, computed once as Value is hashed for every hashed membership test"""
+        return hash(self.value)
+
     def __matmul__(self, policy: ParamPolicy) -> bool:
         """ Value @ Policy"""
-        return self in policy.param.possible and self in policy.allowed and self not in policy.denied
+        return self in policy.param.possible and policy @ self
 
     def __pow__(self, policy: ParamPolicy) -> dict[str, str]:
         """ Value ** Policy"""
         return policy.param.get_implementation(self.value if self @ policy else NoValue)
 
 
-@attr.s(frozen=True)
+def values_converter(data: typing.Any) -> typing.Any:
+    """ Value.cast, skipped for the common case of a tuple that holds only Value already"""
+    if type(data) is tuple and all(type(v) is Value for v in data):
+        return data
+    return Value.cast(data)
+
+
+@attr.s(frozen=True, slots=True, hash=False)
 class Values(Serializable):
-    values = attr.ib(type=typing.Tuple[Value, ...], converter=Value.cast, factory=tuple,
-                     validator=attr.validators.deep_iterable(is_instance_of(Value), is_instance_of(tuple)))
+    values = attr.ib(type=typing.Tuple[Value, ...], converter=values_converter, factory=tuple)
+    _values_hash = cache_field()
+    _matches_all = cache_field()
+    _value_set = cache_field()
+
+    @values.validator
+    def values_validator(self, attribute, value):
+        if not isinstance(value, tuple):
+            raise TypeError(f'{attribute.name} must be a tuple, got {value!r}')
+        if not all(isinstance(v, Value) for v in value):
+            bad = ', '.join(repr(v) for v in value if not isinstance(v, Value))
+            raise TypeError(f'{attribute.name} must only hold Value, got {bad}')
 
     def __bool__(self) -> bool:
         return bool(self.values)
 
+    def __hash__(self) -> int:
+        return self.values_hash
+
+    @cached_slot
+    def values_hash(self) -> int:
+        return hash(self.values)
+
     def __contains__(self, item: Value) -> bool:
         if self.values is AllValues:
             return item.value == AnyValue
-        return item.value in self.values
+        if self.value_set is None or isinstance(item.value, Specials):
+            return item in self.values
+        return item in self.value_set
 
     def __iter__(self) -> typing.Generator[Value, None, None]:
         yield from self.values
 
+    @cached_slot
+    def matches_all(self) -> bool:
+        """ True if values is AllValues or contains AnyValue, i.e. every value is a member"""
+        return self.values is AllValues or any(v.value is AnyValue or v.value is AllValues for v in self.values)
+
+    @cached_slot
+    def value_set(self) -> typing.Optional[typing.FrozenSet[Value]]:
+        """ values as a set for hashed membership tests, None if values hold Specials which match by equality"""
+        if self.values is AllValues or any(isinstance(v.value, Specials) for v in self.values):
+            return None
+        return frozenset(self.values)
+
+    def members(self, other: Values) -> typing.Collection[Value]:
+        """ values of other to test values of self against, hashed unless either side holds Specials"""
+        if self.value_set is None or other.value_set is None:
+            return other.values
+        return other.value_set
+
     def __add__(self, other: Values) -> typing.Union[Values, Specials]:
         """ add values, return values that are in either i.e. union of sets"""
         if self.values is AllValues or other.values is AllValues:
             values = AllValues
         else:
-            values = self.values + tuple(v for v in other.values if v not in self.values)
-        return attr.evolve(self, values=values, doc=f'{self.doc} (+) {other.doc}', id='')
+            members = other.members(self)
+            values = self.values + tuple(itertools.filterfalse(members.__contains__, other.values))
+        return intermediate_evolve(self, values=values, doc=f'{self.doc} (+) {other.doc}', id='')
 
     def __sub__(self, other: Values) -> typing.Union[Values, Specials]:
         """ remove values from self that are also in other"""
@@ -221,8 +486,9 @@ class Values(Serializable):
         elif other.values is AllValues:
             values = tuple()
         else:
-            values = tuple(v for v in self.values if v not in other.values)
-        return attr.evolve(self, values=values, doc=f'{self.doc} (-) {other.doc}', id='')
+            members = self.members(other)
+            values = tuple(itertools.filterfalse(members.__contains__, self.values))
+        return intermediate_evolve(self, values=values, doc=f'{self.doc} (-) {other.doc}', id='')
 
     def __mod__(self, other: Values) -> typing.Union[Values, Specials]:
         """ return values that are in both i.e. intersection of sets"""
@@ -230,21 +496,33 @@ class Values(Serializable):
             return other
         if other.values is AllValues:
             return self
-        values = tuple(v for v in self.values if v in other.values)
-        return attr.evolve(self, values=values, doc=f'{self.doc} (%) {other.doc}', id='')
+        members = self.members(other)
+        values = tuple(filter(members.__contains__, self.values))
+        return intermediate_evolve(self, values=values, doc=f'{self.doc} (%) {other.doc}', id='')
+
+    def common_minus(self, other: Values, removed: Values) -> typing.Union[Values, Specials]:
+        """ (self % other) - removed in one pass, without building the intermediate intersection"""
+        sources = (self, other, removed)
+        if any(s.values is AllValues for s in sources) or any(s.value_set is None for s in sources):
+            return (self % other) - removed
+        common, excluded = other.value_set, removed.value_set
+        values = tuple(v for v in self.values if v in common and v not in excluded)
+        return intermediate_evolve(self, values=values, doc=f'{self.doc} (%) {other.doc} (-) {removed.doc}', id='')
 
 
 AllVals = Values(values=(Value(AnyValue),), id='id:AllVals')
 NoVals = Values(values=tuple(), id='id:NoVals')
+repo.pin(AllVals)
+repo.pin(NoVals)
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class Target(Serializable):
     name = attr.ib(type=str, validator=is_instance_of(str))
     uri = attr.ib(type=str, default='', eq=False, validator=is_instance_of(str))
 
 
-@attr.s(frozen=True, kw_only=True)
+@attr.s(frozen=True, slots=True, kw_only=True)
 class Param(Serializable):
     name = attr.ib(type=str, validator=is_instance_of(str))
     target = attr.ib(type=Target, validator=is_instance_of(Target))
@@ -264,21 +542,28 @@ def register_implementation(func: typing.Callable[[str, typing.Union[bool, int,
     implementation_repo[name] = func
 
 
-@attr.s(frozen=True)
+@attr.s(frozen=True, slots=True)
 class ParamPolicy(Param):
     param = attr.ib(type=Param, converter=Param.cast, validator=is_instance_of(Param))
     allowed = attr.ib(type=Values, converter=Values.cast, default=AllVals, validator=is_instance_of(Values))
     denied = attr.ib(type=Values, converter=Values.cast, default=NoVals, validator=is_instance_of(Values))
+    _effective = cache_field()
+
+    def __attrs_post_init__(self):
+        Serializable.__attrs_post_init__(self)
+        if caching.get():  # set operations build allowed and denied uncached, keep those that end up in a policy
+            repo.put(obj=self.allowed)
+            repo.put(obj=self.denied)
 
     def __add__(self: ParamPolicy, other: ParamPolicy) -> typing.Union[ParamPolicy, ParamsPolicies]:
         if self.param == other.param:
             denied = self.denied + other.denied
-            allowed = (self.allowed % other.allowed) - denied
+            allowed = self.allowed.common_minus(other.allowed, denied)
             doc = f'{self.doc} (+) {other.doc}'
             name = f'{self.name}+{other.name}'
             return ParamPolicy(target=self.target, param=self.param, id='', doc=doc, name=name,
                                allowed=allowed, denied=denied)
-        return attr.evolve(NullParamsPolicies, policy=FrozenDict({self.id: self, other.id: other}), id='', doc='')
+        return attr.evolve(NullParamsPolicies, policy=frozen_policies({self.id: self, other.id: other}), id='', doc='')
 
     def __sub__(self, other: ParamPolicy) -> ParamPolicy:
         if self.param == other.param:
@@ -290,29 +575,63 @@ class ParamPolicy(Param):
                                allowed=allowed, denied=denied)
         return self
 
+    def __matmul__(self, value: Value) -> bool:
+        """ Policy @ Value"""
+        if (effective := self.effective) is not None and not isinstance(value.value, Specials):
+            return value in effective
+        if self.denied.matches_all:
+            return False
+        return (self.allowed.matches_all or value in self.allowed.values) and value not in self.denied.values
+
+    @cached_slot
+    def effective(self) -> typing.Optional[typing.FrozenSet[Value]]:
+        """ values that are allowed and not denied, None if allowed matches all or either side holds Specials"""
+        if self.denied.matches_all:
+            return frozenset()
+        if self.allowed.matches_all or any(isinstance(v.value, Specials)
+                                           for v in self.allowed.values + self.denied.values):
+            return None
+        return frozenset(self.allowed.values) - frozenset(self.denied.values)
+
     def __bool__(self: ParamPolicy) -> bool:
         if self.denied is AllValues:
             return False
         return bool(self.allowed - self.denied)
 
 
-@attr.s(frozen=True)
+def frozen_policies(policies: typing.Dict[str, ParamPolicy]) -> FrozenDict[str, ParamPolicy]:
+    """ FrozenDict of ParamPolicy values, which need no freezing, copied in one C-level dict init"""
+    frozen = FrozenDict.__new__(FrozenDict)
+    dict.__init__(frozen, policies)
+    return frozen
+
+
+def merge_param_policies(policies: typing.Iterable[ParamPolicy]) -> typing.Tuple[ParamPolicy, ...]:
+    """ add only those policies that apply to the same target and param, pass the others through as they are"""
+    buckets = {}
+    for policy in policies:
+        buckets.setdefault((policy.target.id, policy.param.id), []).append(policy)
+    return tuple(b[0] if len(b) == 1 else functools.reduce(lambda x, y: x + y, b) for b in buckets.values())
+
+
+@attr.s(frozen=True, slots=True)
 class ParamsPolicies(Param):
     policies = attr.ib(type=tuple[typing.Union[str, ParamPolicy], ...], default='',
                        validator=attr.validators.deep_iterable(is_instance_of(ParamPolicy),
                                                                is_instance_of((str, ParamPolicy))))
     expression = attr.ib(type=str, default='', validator=is_instance_of(str))
     policy = attr.ib(type=FrozenDict[str, ParamPolicy])
+    _policy_map = cache_field()
 
     @policy.default
     def policy_default(self):
         if self.expression:
             return ParamPolicy.cast(self.expression)
         if self.policies:
-            return functools.reduce(lambda x, y: x + y, (ParamPolicy.cast(p) for p in self.policies))
+            return frozen_policies({p.id: p for p in merge_param_policies(ParamPolicy.cast(p) for p in self.policies)})
         return FrozenDict({})
 
-    @functools.cached_property
+    @cached_slot
     def policy_map(self) -> dict[str, dict[str, str]]:
         policy_map = {}
         for pid, p in self.policy.items():
@@ -321,33 +640,44 @@ class ParamsPolicies(Param):
             policy_map[p.target.id][p.param.id] = pid
         return FrozenDict(policy_map)
 
+    def combine(self, others: typing.Iterable[ParamPolicy], subtract: bool = False) -> ParamsPolicies:
+        """ add (or subtract) several ParamPolicy in one pass, evolving into a single new ParamsPolicies"""
+        policy, merged, changed = dict(self.policy), {}, False  # merged policies go in front, latest first
+        policy_map = {t: dict(m) for t, m in self.policy_map.items()}
+        for other in others:
+            target_map = policy_map.setdefault(other.target.id, {})
+            pid = target_map.get(other.param.id)
+            if pid is not None:
+                current = merged.pop(pid) if pid in merged else policy.pop(pid)
+                param_policy = current - other if subtract else current + other
+                merged.pop(param_policy.id, None)
+                merged[param_policy.id] = param_policy
+                target_map[other.param.id] = param_policy.id
+            elif not subtract:
+                policy[other.id] = other
+                target_map[other.param.id] = other.id
+            else:
+                continue
+            changed = True
+        if subtract and not changed:
+            return self
+        result = dict(reversed(merged.items()))
+        result.update(policy)
+        return unchecked_evolve(self, policy=frozen_policies(result), id='',
+                                _policy_map=FrozenDict({t: m for t, m in policy_map.items() if m}))
+
     def __add__(self, other: typing.Union[ParamsPolicies, ParamPolicy]) -> ParamsPolicies:
-        if isinstance(other, ParamPolicy):
-            if other.target.id in self.policy_map:
-                if other.param.id in self.policy_map[other.target.id]:
-                    pid = self.policy_map[other.target.id][other.param.id]
-                    param_policy = self.policy[pid] + other
-                    policy = FrozenDict({param_policy.id: param_policy,
-                                         **{k: v for k, v in self.policy.items() if k != pid}})
-                    return attr.evolve(self, policy=policy, id='')
-            policy = FrozenDict(dict(self.policy, **{other.id: other}))
-            return attr.evolve(self, policy=policy, id='')
-        return functools.reduce(lambda p, q: p + q, other.policy.values(), self)
+        return self.combine((other,) if isinstance(other, ParamPolicy) else other.policy.values())
 
     def __sub__(self, other: typing.Union[ParamsPolicies, ParamPolicy]) -> ParamsPolicies:
-        if isinstance(other, ParamPolicy):
-            if other.target.id in self.policy_map:
-                if other.param.id in self.policy_map[other.target.id]:
-                    pid = self.policy_map[other.target.id][other.param.id]
-                    param_policy = self.policy[pid] - other
-                    policy = FrozenDict({param_policy.id: param_policy,
-                                         **{k: v for k, v in self.policy.items() if k != pid}})
-                    return attr.evolve(self, policy=policy, id='')
-            return self
-        return functools.reduce(lambda p, q: p - q, other.policy.values(), self)
+        return self.combine((other,) if isinstance(other, ParamPolicy) else other.policy.values(), subtract=True)
+
 
+type_dispatch.update({name: obj for name, obj in globals().items()
+                      if isinstance(obj, type) and issubclass(obj, Serializable)})
 
 NullParamsPolicies = ParamsPolicies(id='id:NullParamsPolicies', name='Param Policies', target=Target(name=AnyValue))
+repo.pin(NullParamsPolicies)
 
 if __name__ == '__main__':
     param1 = Param.load(identifier='id:policies.test.param_param1')
@@ -367,5 +697,5 @@ if __name__ == '__main__':
     params_pol1 = ParamsPolicies.load(identifier='id:policies.test.paramspolicies_ParamPolicies1')
 
     print(repo.list)
-    for pol_id, pol in tuple(repo.repo_cache.items()):
-        pol.compile()
+    policies = tuple(repo.repo_cache.values())
+    Serializable.dump_many(tuple(unchecked_evolve(pol, id=pol.compiled_id) for pol in policies))
@@ -21,25 +21,33 @@ def _find_type_origin(type_hint):
         yield actual_type
 
 
-def _check_types(parameters, hints):
+def _type_origins(hints):
+    return {name: actual_types
+            for name, type_hint in hints.items() if (actual_types := tuple(_find_type_origin(type_hint)))}
+
+
+def _check_types(parameters, hints, origins):
     for name, value in parameters.items():
-        type_hint = hints.get(name, typing.Any)
-        actual_types = tuple(_find_type_origin(type_hint))
+        actual_types = origins.get(name)
         if actual_types and (not isinstance(value, actual_types)) and (value not in actual_types):
-            raise TypeError(f"Expected type '{type_hint}' for argument '{name}'"
+            raise TypeError(f"Expected type '{hints[name]}' for argument '{name}'"
                             f" but received type '{type(value)}' instead")
 
 
 def enforce_types(decorated_func):
+    if not __debug__:
+        return decorated_func
+
     def decorate(func):
         hints = typing.get_type_hints(func)
+        origins = _type_origins(hints)
         func_signature = inspect.signature(func)
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             parameters = dict(zip(func_signature.parameters, args))
             parameters.update(kwargs)
-            _check_types(parameters, hints)
+            _check_types(parameters, hints, origins)
 
             return func(*args, **kwargs)
 
@@ -53,8 +61,12 @@ def enforce_types(decorated_func):
 
 
 def enforce_strict_types(decorated_func):
+    if not __debug__:
+        return decorated_func
+
     def decorate(func):
         hints = typing.get_type_hints(func)
+        origins = _type_origins(hints)
         func_signature = inspect.signature(func)
 
         @functools.wraps(func)
@@ -63,7 +75,7 @@ def enforce_strict_types(decorated_func):
             bound.apply_defaults()
             parameters = dict(zip(func_signature.parameters, bound.args))
             parameters.update(bound.kwargs)
-            _check_types(parameters, hints)
+            _check_types(parameters, hints, origins)
 
             return func(*args, **kwargs)
 
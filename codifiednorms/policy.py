@@ -5,6 +5,8 @@ Class BasePolicy, Policy, PolicySet, Config
 """
 from __future__ import annotations
 
+import collections
+import concurrent.futures
 import dataclasses
 import itertools
 import json
@@ -26,27 +28,54 @@ repo_root = pathlib.Path(os.getcwd().split('repository')[0]).joinpath('repositor
 
 @enforce_strict_types
 def location(file: pathlib.Path) -> str:
-    return f'{file.relative_to(repo_root).parent}.{file.stem}'.replace('/', '.')
+    return f'{file.relative_to(repo_root).parent}.{file.stem}'.replace(os.sep, '.')
 
 
 @enforce_strict_types
 def ls_repo(path: typing.Optional[pathlib.Path] = None) -> typing.Generator[pathlib.Path, None, None]:
-    path = path or repo_root
-    for file in path.iterdir():
-        if file.is_dir():
-            yield from ls_repo(file)
+    stack = [iter(list(os.scandir(path or repo_root)))]  # one iterator per open directory, depth first
+    while stack:
+        for entry in stack[-1]:
+            if entry.is_dir():
+                stack.append(iter(list(os.scandir(entry.path))))
+                break
+            yield pathlib.Path(entry.path)
         else:
-            yield file
+            stack.pop()
+
+
+@enforce_strict_types
+def read_policy_data(file: pathlib.Path) -> typing.Optional[typing.Dict]:
+    file_location = location(file)  # a file outside the repository is an error, not an unreadable policy
+    try:
+        return dict(json.loads(file.read_bytes()), **{'location': file_location})
+    except (IOError, json.JSONDecodeError, UnicodeDecodeError, ValueError):
+        return
+
+
+@functools.lru_cache(maxsize=1)
+def scan_repo() -> typing.Tuple[typing.Dict, ...]:
+    """ data of every readable policy file, shared by all callers until invalidated: do not modify the dicts"""
+    with concurrent.futures.ThreadPoolExecutor() as executor:  # file reads overlap, results keep ls_repo order
+        return tuple(data for data in executor.map(read_policy_data, ls_repo()) if data is not None)
 
 
 @enforce_strict_types
 def intersection(l1: typing.Iterable[str], l2: typing.Iterable[str]) -> typing.Tuple[str, ...]:
-    return tuple(set(l1 or l2).intersection(set(l2 or l1)))
+    return tuple(set(l1 or l2).intersection(l2 or l1))
 
 
 @enforce_strict_types
 def union(l1: typing.Iterable[str], l2: typing.Iterable[str]) -> typing.Tuple[str, ...]:
-    return tuple(set(l1).union(set(l2)))
+    return tuple(set(l1).union(l2))
+
+
+def frozen_intersection(s1: typing.FrozenSet[Val], s2: typing.FrozenSet[Val]) -> typing.Tuple[Val, ...]:
+    return tuple((s1 or s2) & (s2 or s1))
+
+
+def frozen_union(s1: typing.FrozenSet[Val], s2: typing.FrozenSet[Val]) -> typing.Tuple[Val, ...]:
+    return tuple(s1 | s2)
 
 
 @enforce_strict_types
@@ -62,15 +91,19 @@ class BasePolicy:
     @staticmethod
     def __data_mapper__(data: dict) -> dict:
         return {param: data.get(param, f'replace with {param} value')
-                for param in (field.name for field in dataclasses.fields(BasePolicy))}
+                for param in BasePolicy.field_names()}
+
+    @functools.cached_property
+    def field_values(self) -> typing.Dict:
+        return {name: getattr(self, name) for name in self.field_names()}
 
     @functools.cached_property
     def as_dict(self) -> typing.Dict:
-        return {'id': self.id, **dataclasses.asdict(self)}
+        return {'id': self.id, **self.field_values}
 
     @functools.cached_property
     def id(self) -> str:
-        content = dataclasses.asdict(self)
+        content = dict(self.field_values)
         content.pop('doc')
         return f'{self.location}:{str(uuid.uuid5(uuid.NAMESPACE_URL, str(sorted(content.items()))))}'
 
@@ -80,43 +113,59 @@ class BasePolicy:
 
     @functools.cached_property
     def is_empty(self) -> bool:
-        fields = set(field.name for field in dataclasses.fields(self.__class__)) - \
-                 set(field.name for field in dataclasses.fields(BasePolicy))
+        fields = set(self.field_names()) - set(BasePolicy.field_names())
         return all(not getattr(self, field) for field in fields) if fields else False
 
     def dump(self, file: pathlib.Path) -> None:
         data = dict(self.as_dict, **{'ts': str(int(time.time()))})
         with open(file, 'w') as out_file:
-            json.dump(data, out_file, indent=4)
+            out_file.write(json.dumps(data, indent=4))
 
     @classmethod
     def from_dict(cls: typing.Type[T], data: typing.Dict, register: bool = True) -> typing.Optional[T]:
         if data['type'] == cls.__name__:
-            obj = cls(**cls.__data_mapper__(data))
-            if register:
-                cls.register(obj)
-            return obj
+            return cls.from_fields(register=register, **cls.__data_mapper__(data))
+
+    @classmethod
+    def from_fields(cls: typing.Type[T], register: bool = True, **fields) -> T:
+        obj = cls(**fields)
+        if register:
+            cls.register(obj)
+        return obj
+
+    @classmethod
+    @functools.lru_cache
+    def field_names(cls) -> typing.Tuple[str, ...]:
+        return tuple(field.name for field in dataclasses.fields(cls))
+
+    @classmethod
+    @functools.lru_cache
+    def get_policy_types(cls: typing.Type[T]) -> typing.Dict[str, typing.Type[T]]:
+        return {c.__name__: c for c in (cls, *cls.__subclasses__())}
 
     @classmethod
     def subclass_from_dict(cls: typing.Type[T], data: typing.Dict) -> typing.Optional[T]:
         try:
-            policy_type = {c.__name__: c for c in (cls, *cls.__subclasses__())}[data['type']]
-            return policy_type.from_dict(data)
+            return cls.get_policy_types()[data['type']].from_dict(data)
         except (KeyError, TypeError, ValueError):
             return
 
     @classmethod
-    def load(cls: typing.Type[T], file: pathlib.Path, register: bool = True) -> typing.Optional[T]:
+    def from_repo_data(cls: typing.Type[T], data: typing.Dict, register: bool = True) -> typing.Optional[T]:
         try:
-            with open(file) as in_file:
-                return cls.from_dict(dict(json.load(in_file), **{'location': location(file)}), register=register)
-        except (IOError, json.JSONDecodeError, KeyError, UnicodeDecodeError, ValueError):
+            return cls.from_dict(data, register=register)
+        except (KeyError, ValueError):
             return
 
+    @classmethod
+    def load(cls: typing.Type[T], file: pathlib.Path, register: bool = True) -> typing.Optional[T]:
+        if (data := read_policy_data(file)) is not None:
+            return cls.from_repo_data(data, register=register)
+
     @classmethod
     @functools.lru_cache
     def get_cached_repo(cls: typing.Type[T]) -> typing.Dict[str, T]:
-        return {obj.id: obj for file in ls_repo() if (obj := cls.load(file=file, register=False)) is not None}
+        return {obj.id: obj for data in scan_repo() if (obj := cls.from_repo_data(data, register=False)) is not None}
 
     @classmethod
     def get(cls: typing.Type[T], obj_id: str, approx_match: bool = False) -> typing.Optional[T]:
@@ -132,6 +181,12 @@ class BasePolicy:
         if obj.id not in cls.get_cached_repo():
             cls.get_cached_repo()[obj.id] = obj
 
+    @staticmethod
+    def invalidate_cache() -> None:
+        scan_repo.cache_clear()  # next get_cached_repo re-reads the repository, dropping registered objects
+        BasePolicy.get_cached_repo.cache_clear()
+        policy_arithmetic_cache.clear()  # memoized results were registered in the dropped repo
+
 
 @enforce_strict_types
 @dataclasses.dataclass(frozen=True)
@@ -152,48 +207,62 @@ class Policy(BasePolicy):
 
     @functools.cached_property
     def params(self) -> typing.Tuple[str, ...]:
-        return tuple(functools.reduce(union, (self.allowed.keys(), self.blocked.keys(),
-                                              self.enforced.keys(), self.required)))
+        return tuple(set(self.allowed).union(self.blocked, self.enforced, self.required))
 
     @functools.cached_property
     def inconsistencies(self) -> str:
-        errors = ''
+        errors = []
         if self.possible:
             for param_list, params in (('allowed', self.allowed.keys()), ('blocked', self.blocked.keys()),
                                        ('required', self.required), ('enforced', self.enforced)):
                 for param in params:
-                    if param not in self.possible:
-                        errors += f'param {param} defined in "{param_list}" is not in "possible": {self.possible}\n'
+                    if param not in self.possible_set:
+                        errors.append(f'param {param} defined in "{param_list}" is not in "possible": '
+                                      f'{self.possible}\n')
         for param, value in self.enforced.items():
-            if param in self.blocked and value in self.blocked[param]:
-                errors += f'enforced value "{value}" for "{param}" is blocked: {self.blocked}\n'
-            if param in self.allowed and value not in self.allowed[param]:
-                errors += f'enforced value "{value}" for "{param}" is not allowed: {self.allowed}\n'
+            if param in self.blocked and value in self.blocked_sets[param]:
+                errors.append(f'enforced value "{value}" for "{param}" is blocked: {self.blocked}\n')
+            if param in self.allowed and value not in self.allowed_sets[param]:
+                errors.append(f'enforced value "{value}" for "{param}" is not allowed: {self.allowed}\n')
         if self.blocked:
             for param, values in self.allowed.items():
                 for value in values:
-                    if param in self.blocked and value in self.blocked[param]:
-                        errors += f'allowed value "{value}" for "{param}" is also blocked: {self.blocked}\n'
+                    if param in self.blocked and value in self.blocked_sets[param]:
+                        errors.append(f'allowed value "{value}" for "{param}" is also blocked: {self.blocked}\n')
         for param, values in self.allowed.items():
             if not values:
-                errors += f'param {param} cannot be assigned any value\n'
-        return errors.strip()
+                errors.append(f'param {param} cannot be assigned any value\n')
+        return ''.join(errors).strip()
+
+    @functools.cached_property
+    def allowed_sets(self) -> typing.Dict[str, typing.FrozenSet[Val]]:
+        return {param: frozenset(values) for param, values in self.allowed.items()}
+
+    @functools.cached_property
+    def blocked_sets(self) -> typing.Dict[str, typing.FrozenSet[Val]]:
+        return {param: frozenset(values) for param, values in self.blocked.items()}
+
+    @functools.cached_property
+    def possible_set(self) -> typing.FrozenSet[str]:
+        return frozenset(self.possible)
 
     def evaluate_policy(self, assigned: FrozenDict[str, str]) -> str:
-        errors = self.inconsistencies
+        errors = [self.inconsistencies]
+        allowed_sets, blocked_sets, enforced, possible_set = \
+            self.allowed_sets, self.blocked_sets, self.enforced, self.possible_set
         for param, value in assigned.items():
-            if value not in self.allowed.get(param, (value,)):
-                errors += f'"{param}"="{value}" not allowed, allowed values are: {self.allowed[param]}\n'
-            if value in self.blocked.get(param, tuple()):
-                errors += f'"{param}"="{value}" is blocked, blocked values are: {self.blocked[param]}\n'
-            if value != self.enforced.get(param, value):
-                errors += f'"{param}"="{value}" is enforced to be "{self.enforced[param]}"\n'
-            if param not in (self.possible or (param,)):
-                errors += f'param "{param}" is not possible, possible params are: {self.possible}\n'
+            if (allowed := allowed_sets.get(param)) is not None and value not in allowed:
+                errors.append(f'"{param}"="{value}" not allowed, allowed values are: {self.allowed[param]}\n')
+            if (blocked := blocked_sets.get(param)) is not None and value in blocked:
+                errors.append(f'"{param}"="{value}" is blocked, blocked values are: {self.blocked[param]}\n')
+            if value != enforced.get(param, value):
+                errors.append(f'"{param}"="{value}" is enforced to be "{enforced[param]}"\n')
+            if possible_set and param not in possible_set:
+                errors.append(f'param "{param}" is not possible, possible params are: {self.possible}\n')
         for param in self.required:
             if param not in assigned:
-                errors += f'param {param} is required to be assigned, required params are: {self.required}\n'
-        return errors.strip()
+                errors.append(f'param {param} is required to be assigned, required params are: {self.required}\n')
+        return ''.join(errors).strip()
 
     def policy_arithmetic_checks(self: Policy, other: Policy) -> None:
         if not (isinstance(self, Policy) and isinstance(other, Policy)):
@@ -228,20 +297,22 @@ class Policy(BasePolicy):
                   for p, v1 in self.enforced.items() if v1 != (v2 := other.enforced.get(p, v1))]:
             return NotImplemented(f'inconsistent values for enforced parameters {ev}')
 
-        return Policy.from_dict(dict(
+        return Policy.from_fields(
             name=f'{self.proper_name} (+) {other.proper_name}',
             version='',
             doc=f'{self.doc} (+) {other.doc}',
             target=self.target,
             location=self.location,
             type='Policy',
-            allowed={param: intersection(self.allowed.get(param, []), other.allowed.get(param, []))
-                     for param in union(self.allowed.keys(), other.allowed.keys())},
-            blocked={param: union(self.blocked.get(param, []), other.blocked.get(param, []))
-                     for param in union(self.blocked.keys(), other.blocked.keys())},
-            enforced=dict(other.enforced, **self.enforced),
+            allowed=FrozenDict({param: frozen_intersection(self.allowed_sets.get(param, frozenset()),
+                                                           other.allowed_sets.get(param, frozenset()))
+                                for param in union(self.allowed.keys(), other.allowed.keys())}),
+            blocked=FrozenDict({param: frozen_union(self.blocked_sets.get(param, frozenset()),
+                                                    other.blocked_sets.get(param, frozenset()))
+                                for param in union(self.blocked.keys(), other.blocked.keys())}),
+            enforced=FrozenDict(dict(other.enforced, **self.enforced)),
             required=union(self.required, other.required),
-            possible=intersection(self.possible, other.possible)))
+            possible=intersection(self.possible, other.possible))
 
     def __sub__(self: Policy, other: typing.Union[Policy, PolicySet]) \
             -> typing.Union[Policy, FrozenDict[str, Policy], PolicySet]:
@@ -273,26 +344,48 @@ class Policy(BasePolicy):
                 policies=(self.id,),
                 exemptions=(other.id,), ))
 
-        return Policy.from_dict(dict(
+        return Policy.from_fields(
             name=f'{self.proper_name} (-) {other.proper_name}',
             version='',
             doc=f'{self.doc} (-) {other.doc}',
             target=self.target,
             location=self.location,
             type='Policy',
-            allowed={param: union(self.allowed.get(param, []), other.allowed.get(param, []))
-                     for param in union(self.allowed.keys(), other.allowed.keys())},
-            blocked={param: tuple(set(values) - set(other.allowed.get(param, [])))
-                     for param, values in self.blocked.items()},
-            enforced={param: value for param, value in self.enforced.items() if value not in other.allowed.get(param)},
+            allowed=FrozenDict({param: union(self.allowed.get(param, []), other.allowed.get(param, []))
+                                for param in union(self.allowed.keys(), other.allowed.keys())}),
+            blocked=FrozenDict({param: tuple(values - other.allowed_sets.get(param, frozenset()))
+                                for param, values in self.blocked_sets.items()}),
+            enforced=FrozenDict({param: value for param, value in self.enforced.items()
+                                 if value not in other.allowed.get(param)}),
             required=tuple(set(self.required) - set(other.allowed.keys())),
-            possible=tuple() if not self.possible else union(self.possible, other.allowed.keys())))
+            possible=tuple() if not self.possible else union(self.possible, other.allowed.keys()))
 
     @property
     def policy(self) -> FrozenDict[str, Policy]:
         return FrozenDict({self.target: self})
 
 
+policy_arithmetic_cache_size = 4096
+policy_arithmetic_cache: typing.OrderedDict[typing.Tuple[str, str, str, str, str], Policy] = collections.OrderedDict()
+
+
+def policy_arithmetic_key(op: str, p1: Policy, p2: Policy) -> typing.Tuple[str, str, str, str, str]:
+    """ memo key of p1 op p2: id covers every field but doc, and the result's doc is built from both docs"""
+    return op, p1.id, p1.doc, p2.id, p2.doc
+
+
+def policy_arithmetic(op: str, p1: Policy, p2: Policy) -> Policy:
+    """ p1 + p2 or p1 - p2, memoized in the policy_arithmetic_cache LRU"""
+    key = policy_arithmetic_key(op, p1, p2)
+    if (result := policy_arithmetic_cache.get(key)) is None:
+        result = policy_arithmetic_cache[key] = p1 + p2 if op == '+' else p1 - p2
+        if len(policy_arithmetic_cache) > policy_arithmetic_cache_size:
+            policy_arithmetic_cache.popitem(last=False)
+    else:
+        policy_arithmetic_cache.move_to_end(key)
+    return result
+
+
 @enforce_strict_types
 @dataclasses.dataclass(frozen=True)
 class PolicySet(BasePolicy):
@@ -306,25 +399,27 @@ class PolicySet(BasePolicy):
 
     @functools.cached_property
     def as_dict(self) -> typing.Dict:
-        return {'id': self.id, **dataclasses.asdict(self), 'policy': {t: p.as_dict for t, p in self.policy.items()}}
+        return {'id': self.id, **self.field_values, 'policy': {t: p.as_dict for t, p in self.policy.items()}}
 
     @functools.cached_property
     def policy(self) -> FrozenDict[str, Policy]:
-        def key(policy):
-            return policy.target
+        repo = Policy.get_cached_repo()
 
-        try:
-            policies = {
-                k: list(v)
-                for k, v in itertools.groupby(sorted([Policy.get(pid) for pid in self.policies], key=key), key=key)}
-            exemptions = {
-                k: list(v)
-                for k, v in itertools.groupby(sorted([Policy.get(pid) for pid in self.exemptions], key=key), key=key)}
+        def by_target(policy_ids):
+            buckets = {}
+            for pid in policy_ids:
+                if (policy := repo.get(pid)) is None:
+                    return
+                buckets.setdefault(policy.target, []).append(policy)
+            return buckets
 
+        if (policies := by_target(self.policies)) is None or (exemptions := by_target(self.exemptions)) is None:
+            return FrozenDict({})
+        try:
             return FrozenDict({
-                target: functools.reduce(lambda x, y: x - y, exemptions.get(target, []),
-                                         functools.reduce(lambda x, y: x + y, policies[target]))
-                for target in policies.keys()})
+                target: functools.reduce(lambda x, y: policy_arithmetic('-', x, y), exemptions.get(target, []),
+                                         functools.reduce(lambda x, y: policy_arithmetic('+', x, y), policies[target]))
+                for target in sorted(policies)})
         except AttributeError:
             return FrozenDict({})
 
@@ -364,7 +459,7 @@ class Config(BasePolicy):
 
     @functools.cached_property
     def as_dict(self) -> typing.Dict:
-        return {'id': self.id, **dataclasses.asdict(self), 'policy': {t: p.as_dict for t, p in self.policy.items()}}
+        return {'id': self.id, **self.field_values, 'policy': {t: p.as_dict for t, p in self.policy.items()}}
 
     @functools.cached_property
     def policy(self) -> FrozenDict[str, Policy]:
@@ -383,17 +478,14 @@ class Config(BasePolicy):
         else:
             errors += '\n'.join(f'policy for {target} has errors:\n{policy.inconsistencies}\n'
                                 for target, policy in self.policy.items() if policy.inconsistencies != '')
-            for target in self.assigned.keys():
-                if target not in self.policy:
-                    errors += f'no policy defined in applicable for target {target}'
+            errors += ''.join(f'no policy defined in applicable for target {target}'
+                              for target in self.assigned.keys() if target not in self.policy)
         return errors.strip()
 
     @functools.cached_property
     def policy_violations(self) -> str:
-        errors = self.inconsistencies
-        for target, assigned in self.assigned.items():
-            if target in self.policy:
-                errors += self.policy[target].evaluate_policy(assigned=assigned)
+        errors = self.inconsistencies + ''.join(self.policy[target].evaluate_policy(assigned=assigned)
+                                                for target, assigned in self.assigned.items() if target in self.policy)
         return errors.strip()
 
     @functools.cached_property
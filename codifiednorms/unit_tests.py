@@ -1,10 +1,17 @@
+import collections
+import functools
+import os
+import tempfile
 import typing
 from dataclasses import FrozenInstanceError
 from functools import reduce
 from itertools import groupby
 from pathlib import Path
-from unittest import TestCase, main
+from unittest import TestCase, main, mock
 
+from .data_types import (AllVals, AnyValue, NoVals, NoValue, NullParamsPolicies, Param, ParamPolicy, ParamsPolicies,
+                         Repo, Target, Value, Values, repo as data_repo)
+from . import policy as policy_module
 from .freezer import FrozenDict
 from .policy import BasePolicy, Policy, PolicySet, ls_repo
 
@@ -201,10 +208,143 @@ class ConfigAsCodeTests(TestCase):
                      blocked_not_in_possible, required_not_in_possible):
             self.assertNotEqual(func().inconsistencies, '')
 
+    def test_PolicyEvaluation(self):
+        self.assertEqual(p1.evaluate_policy(FrozenDict({'param1': 'val1', 'param9': 'val9'})), '')
+        self.assertIn('not allowed', p1.evaluate_policy(FrozenDict({'param1': 'val0'})))
+        self.assertIn('is blocked', p1.evaluate_policy(FrozenDict({'param1': 'val0'})))
+        self.assertIn('is blocked', p2.evaluate_policy(FrozenDict({'param1': 'val1'})))
+
     def test_PolicyErrors(self):
         # noinspection PyTypeChecker
         self.assertIsInstance(p1 + ps1, FrozenDict)
 
+    def test_ValuesContains(self):
+        values = Values(values=(Value('a'), Value('b')))
+        self.assertIn(Value('a'), values)
+        self.assertNotIn(Value('c'), values)
+        self.assertIn(Value(AnyValue), values)
+        self.assertNotIn(Value(NoValue), values)
+        values = Values(values=(Value('a'), Value(NoValue)))
+        self.assertIn(Value('a'), values)
+        self.assertNotIn(Value('c'), values)
+        self.assertIn(Value('c'), AllVals)
+
+    def test_ParamPolicyMatmul(self):
+        target = Target(name='test target')
+        param = Param(name='test param', target=target)
+        a, b, c = Value('a'), Value('b'), Value('c')
+        pp = ParamPolicy(name='test pp', target=target, param=param, allowed=Values(values=(a, b)),
+                         denied=Values(values=(b,)))
+        self.assertTrue(pp @ a)
+        self.assertFalse(pp @ b)
+        self.assertFalse(pp @ c)
+        self.assertFalse(pp @ Value(AnyValue))
+        pp = ParamPolicy(name='test pp allowed novalue', target=target, param=param,
+                         allowed=Values(values=(a, Value(NoValue))), denied=NoVals)
+        self.assertTrue(pp @ a)
+        self.assertFalse(pp @ c)
+        self.assertTrue(pp @ Value(AnyValue))
+        pp = ParamPolicy(name='test pp denied novalue', target=target, param=param,
+                         allowed=AllVals, denied=Values(values=(b, Value(NoValue))))
+        self.assertTrue(pp @ a)
+        self.assertFalse(pp @ b)
+
+    def test_ParamPolicyMergeCached(self):
+        target = Target(name='test target')
+        param = Param(name='test param', target=target)
+        pp1 = ParamPolicy(name='test pp merge1', target=target, param=param,
+                          allowed=Values(values=(Value('a'), Value('b'))), denied=Values(values=(Value('c'),)))
+        pp2 = ParamPolicy(name='test pp merge2', target=target, param=param,
+                          allowed=Values(values=(Value('b'),)), denied=Values(values=(Value('d'),)))
+        for merged in (pp1 + pp2, pp1 - pp2):
+            self.assertEqual(data_repo.get(merged.allowed.id), merged.allowed)
+            self.assertEqual(data_repo.get(merged.denied.id), merged.denied)
+
+    def test_ValueCastShared(self):
+        shared = Value.cast('shared')
+        self.assertIs(Value.cast('shared'), shared)
+        cwd = os.getcwd()
+        try:
+            os.chdir(data_repo.root_str + os.sep + 'policies')
+            self.assertEqual(Value.cast('shared').id, 'id:policies.value_shared')
+            self.assertIsNot(Value.cast('shared'), shared)
+        finally:
+            os.chdir(cwd)
+
+    def test_SerializableRoundTrip(self):
+        target = Target(name='test target')
+        pp1 = ParamPolicy(name='test pp1', target=target, param=Param(name='test param1', target=target),
+                          allowed=Values(values=(Value('a'), Value('b'))))
+        pp2 = ParamPolicy(name='test pp2', target=target, param=Param(name='test param2', target=target))
+        self.assertEqual(Values.loads(pp1.allowed.dumps()), pp1.allowed)
+        self.assertEqual(ParamPolicy.loads(pp1.dumps()), pp1)
+        policies = pp1 + pp2
+        loaded = ParamsPolicies.loads(policies.dumps())
+        self.assertIsInstance(loaded, ParamsPolicies)
+        self.assertEqual(loaded, policies)
+        self.assertEqual(sorted(loaded.policy), sorted(policies.policy))
+
+    def test_RepoPinned(self):
+        small_repo = Repo(root=data_repo.root, cache_size=1)
+        small_repo.pin(AllVals)
+        small_repo.put(NoVals)
+        small_repo.put(Value('pinned'))
+        self.assertIs(small_repo.get(AllVals.id), AllVals)
+        self.assertIsNone(small_repo.get(NoVals.id))
+        for obj in (AllVals, NoVals, NullParamsPolicies):
+            self.assertIs(data_repo.get(obj.id), obj)
+
+    def test_RepoValidId(self):
+        self.assertTrue(data_repo.is_valid_id('id:policies.test.target_target1'))
+        for identifier in ('policies.test.target_target1', 'id:/etc/passwd', 'id:../../etc/x', 'id:.hidden',
+                           'id:policies..test', 'id:policies/../../etc/x', 'id:'):
+            self.assertFalse(data_repo.is_valid_id(identifier), identifier)
+
+    def test_Location(self):
+        root = policy_module.repo_root
+        self.assertEqual(policy_module.location(root.joinpath('policies', 'test', 'p1.json')), 'policies.test.p1')
+        self.assertEqual(policy_module.location(root.joinpath('p1.json')), '..p1')
+        self.assertEqual(policy_module.location(root.joinpath('policies', 'p1.v2.json')), 'policies.p1.v2')
+        self.assertEqual(policy_module.location(root.joinpath('policies', 'p1')), 'policies.p1')
+        self.assertRaises(ValueError, policy_module.location, root.parent.joinpath('p1.json'))
+        self.assertRaises(ValueError, policy_module.location, root.parent.joinpath(root.name + '2', 'p1.json'))
+
+    def test_ReadPolicyData(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(policy_module, 'repo_root', Path(tmp)):
+            Path(tmp).joinpath('corrupt.json').write_text('{')
+            self.assertIsNone(policy_module.read_policy_data(Path(tmp).joinpath('corrupt.json')))
+            self.assertRaises(ValueError, policy_module.read_policy_data, Path(tmp).parent.joinpath('outside.json'))
+
+    def test_PolicyRepoReload(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(policy_module, 'repo_root', Path(tmp)), \
+                mock.patch.object(policy_module, 'scan_repo',
+                                  functools.lru_cache(maxsize=1)(policy_module.scan_repo.__wrapped__)), \
+                mock.patch.object(BasePolicy, 'get_cached_repo',
+                                  classmethod(functools.lru_cache(BasePolicy.get_cached_repo.__wrapped__))), \
+                mock.patch.object(policy_module, 'policy_arithmetic_cache', collections.OrderedDict()):
+            self.assertEqual(len(BasePolicy.get_cached_repo()), 0)
+            policy = Policy.from_dict(dict(name='test reload', version='1', doc='doc', target='test',
+                                           location='test.reload', type='Policy', allowed={'param1': ['val1']}),
+                                      register=False)
+            Path(tmp).joinpath('test').mkdir()
+            policy.dump(Path(tmp).joinpath('test', 'reload.json'))
+            policy_module.policy_arithmetic('+', p1, p2)
+            self.assertIsNone(Policy.get(policy.id))
+            BasePolicy.invalidate_cache()
+            self.assertEqual(Policy.get(policy.id), policy)
+            self.assertEqual(len(policy_module.policy_arithmetic_cache), 0)
+
+    def test_RepoNew(self):
+        cwd = os.getcwd()
+        try:
+            os.chdir(data_repo.root_str + os.sep + 'policies')
+            self.assertEqual(data_repo.new('x'), 'id:policies.x')
+            os.chdir(data_repo.root.parent)
+            self.assertEqual(data_repo.new('x'), 'id:x')
+        finally:
+            os.chdir(cwd)
+
 
 if __name__ == '__main__':
     main()